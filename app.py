@@ -9,6 +9,7 @@ import time
 import mimetypes
 import websocket # New import
 import json # New import
+import journal
 
 # Optional translation support
 try:
@@ -25,6 +26,9 @@ if not RESEMBLE_API_KEY:
 
 Resemble.api_key(RESEMBLE_API_KEY)
 
+# Opt-in request journal (set RESEMBLE_JOURNAL_PATH); see journal.py and replay.py
+journal.enable_from_env()
+
 # --- Model version choices from the docs ---
 # Note: Language support depends on the selected voice, not directly on the model version.
 TTS_MODELS = [
@@ -95,6 +99,7 @@ def maybe_translate_text(input_text: str, target_bcp47_code: str) -> tuple[str,
 
 # --- ENHANCEMENT FUNCTION ---
 
+@journal.journaled("enhance", payload="audio_file_path", payload_is_file=True)
 def enhance_audio(audio_file_path, enhancement_level=1.0, target_loudness=-14, peak_limit=-1):
     if not audio_file_path:
         return None, "Please upload an audio file to enhance."
@@ -114,6 +119,7 @@ def enhance_audio(audio_file_path, enhancement_level=1.0, target_loudness=-14, p
             "loudness_peak_limit": str(peak_limit)  # -9 to 0
         }
         try:
+            journal.mark_upstream()
             res = requests.post(url, headers=headers, files=files, data=data)
             if not res.ok:
                 print("RESPONSE:", res.text)
@@ -186,6 +192,7 @@ def get_voice_uuid(selected_voice_name, all_voices_data):
     print(f"Selected voice '{selected_voice_name}' with UUID: {voice_uuid}")
     return voice_uuid
 
+@journal.journaled("tts", payload="text")
 def generate_tts_clip(text, voice_uuid, project_uuid, language_code="en-US", auto_translate=True):
     if not all([text, voice_uuid, project_uuid]):
         return None, "Missing text, voice UUID, or project UUID."
@@ -199,6 +206,7 @@ def generate_tts_clip(text, voice_uuid, project_uuid, language_code="en-US", aut
             text_to_use, translate_note = maybe_translate_text(text, language_code)
         # Wrap the text in an SSML <lang> tag
         ssml_body = f'<speak><lang xml:lang="{language_code}">{text_to_use}</lang></speak>'
+        journal.mark_upstream(len(text_to_use.encode("utf-8")))
         response = Resemble.v2.clips.create_sync(
             project_uuid=project_uuid,
             voice_uuid=voice_uuid,
@@ -222,6 +230,7 @@ def generate_tts_clip(text, voice_uuid, project_uuid, language_code="en-US", aut
         error_message = f"Error generating TTS clip: {e}"
         return None, f"{error_message} RTT: N/A"
 
+@journal.journaled("ssml", payload="ssml")
 def generate_ssml_tts_clip(ssml, voice_uuid, project_uuid, language_code="en-US"):
     if not all([ssml, voice_uuid, project_uuid]):
         return None, "Missing SSML, voice UUID, or project UUID."
@@ -229,6 +238,7 @@ def generate_ssml_tts_clip(ssml, voice_uuid, project_uuid, language_code="en-US"
     print("Note: For SSML, please ensure your SSML body includes the <lang xml:lang='your-code'> tag for language specification.")
     start_time = time.time()
     try:
+        journal.mark_upstream()
         response = Resemble.v2.clips.create_sync(
             project_uuid=project_uuid,
             voice_uuid=voice_uuid,
@@ -256,6 +266,7 @@ def generate_ssml_tts_clip(ssml, voice_uuid, project_uuid, language_code="en-US"
         print(error_message)
         return None, f"{error_message} RTT: N/A"
 
+@journal.journaled("stream", payload="text")
 def generate_streaming_tts(text, voice_uuid, project_uuid, language_code="en-US", auto_translate=True):
     if not all([text, voice_uuid, project_uuid]):
         return None, "Missing streaming input"
@@ -283,6 +294,7 @@ def generate_streaming_tts(text, voice_uuid, project_uuid, language_code="en-US"
     first_chunk_time = None
     try:
         # Stream response as WAV
+        journal.mark_upstream(len(text_to_use.encode("utf-8")))
         r = requests.post(url, headers=headers, json=payload, stream=True)
         if not r.ok:
             error_details = r.text # Capture full error response
@@ -294,6 +306,7 @@ def generate_streaming_tts(text, voice_uuid, project_uuid, language_code="en-US"
                 if chunk:
                     if first_chunk_time is None:
                         first_chunk_time = time.time()
+                        journal.mark_first_byte()
                     f.write(chunk)
         end_time = time.time()
         total_rtt = round((end_time - start_time) * 1000, 2)
@@ -303,6 +316,7 @@ def generate_streaming_tts(text, voice_uuid, project_uuid, language_code="en-US"
     except Exception as e:
         return None, f"Streaming error: {e} RTT: N/A"
 
+@journal.journaled("websocket", payload="text")
 def generate_streaming_tts_websocket(text, voice_uuid, project_uuid, language_code="en-US", auto_translate=True):
     if not all([text, voice_uuid, project_uuid]):
         return None, "Missing streaming input (WebSocket)"
@@ -314,6 +328,7 @@ def generate_streaming_tts_websocket(text, voice_uuid, project_uuid, language_co
     start_time = time.time()
     first_chunk_time = None
     try:
+        journal.mark_upstream()
         ws = websocket.create_connection(websocket_url,
                                          header={'Authorization': f'Bearer {RESEMBLE_API_KEY}'})
 
@@ -334,6 +349,7 @@ def generate_streaming_tts_websocket(text, voice_uuid, project_uuid, language_co
             "sample_rate": 44100,
             "precision": "PCM_16",
         }
+        journal.mark_upstream(len(text_to_use.encode("utf-8")))
         ws.send(json.dumps(payload))
 
         with open(output_filename, "wb") as f:
@@ -357,6 +373,7 @@ def generate_streaming_tts_websocket(text, voice_uuid, project_uuid, language_co
                     # Binary audio data
                     if first_chunk_time is None:
                         first_chunk_time = time.time()
+                        journal.mark_first_byte()
                     f.write(message)
 
         ws.close()
@@ -371,6 +388,7 @@ def generate_streaming_tts_websocket(text, voice_uuid, project_uuid, language_co
     except Exception as e:
         return None, f"Streaming (WebSocket) error: {e} RTT: N/A"
 
+@journal.journaled("sts", payload="source_audio_path", payload_is_file=True)
 def generate_sts_batch_clip(source_audio_path, voice_uuid, project_uuid, sts_model_code, language_code="en-US"):
     if not all([source_audio_path, voice_uuid, project_uuid]):
         return None, "Missing source audio, voice UUID, or project UUID."
@@ -381,6 +399,7 @@ def generate_sts_batch_clip(source_audio_path, voice_uuid, project_uuid, sts_mod
         with open(source_audio_path, "rb") as f:
             audio_bytes = f.read()
             audio_base64 = base64.b64encode(audio_bytes).decode("utf-8")
+            sent_audio_bytes = len(audio_bytes)
 
         # Check and auto-trim audio if base64 length exceeds limit (approx 2000 characters for a short clip)
         if len(audio_base64) > 2000:
@@ -390,6 +409,7 @@ def generate_sts_batch_clip(source_audio_path, voice_uuid, project_uuid, sts_mod
             with open(temp_path, "rb") as f_short:
                 audio_bytes_short = f_short.read()
                 audio_base64 = base64.b64encode(audio_bytes_short).decode("utf-8")
+                sent_audio_bytes = len(audio_bytes_short)
             if len(audio_base64) > 2000:
                 return None, "Audio is too long for STS (even after trimming to 900ms). Use a shorter recording (~0.5 sec)."
             print("Audio trimmed successfully to 900ms.")
@@ -410,6 +430,7 @@ def generate_sts_batch_clip(source_audio_path, voice_uuid, project_uuid, sts_mod
             "sample_rate": 44100 # Default sample rate, can be made configurable if needed
         }
 
+        journal.mark_upstream(sent_audio_bytes)
         response = requests.post(url, headers=headers, json=payload)
         response.raise_for_status()
         result = response.json()
@@ -441,6 +462,7 @@ def generate_sts_batch_clip(source_audio_path, voice_uuid, project_uuid, sts_mod
         if temp_path and os.path.exists(temp_path):
             os.remove(temp_path)
 
+@journal.journaled("clone", payload="audio_file_path", payload_is_file=True)
 def clone_voice(voice_name, audio_file_path, project_uuid, language_code="en-US"):
     if not all([voice_name, audio_file_path, project_uuid]):
         return "Missing voice name, audio file, or project UUID."
@@ -448,6 +470,7 @@ def clone_voice(voice_name, audio_file_path, project_uuid, language_code="en-US"
     print("Note: The 'language_code' for cloning is informative; the cloned voice's language capabilities depend on the training audio provided.")
     try:
         with open(audio_file_path, 'rb') as f:
+            journal.mark_upstream()
             voice_response = Resemble.v2.voices.create(project_uuid, {'name': voice_name})
             print(f"DEBUG: Voice create response: {voice_response}")
             voice_uuid = voice_response['item']['uuid']
@@ -0,0 +1,280 @@
+"""
+Opt-in, append-only journal of the requests the app sends upstream.
+
+Set RESEMBLE_JOURNAL_PATH to a file path to enable it. Each API call made by
+the app is recorded as one JSON line (mode, payload size, voice, timings and
+status). Entries are handed to a background writer thread through a queue, so
+the request path only pays for building a small dict. The journal can be
+re-issued with replay.py for load testing.
+
+Text and audio content are never written; only their size in bytes. App
+functions call mark_upstream() right before talking to Resemble, so calls that
+were rejected locally (missing input, audio too long) are recorded with
+"upstream": false and left out of replays.
+"""
+import atexit
+import functools
+import inspect
+import json
+import os
+import queue
+import threading
+import time
+
+JOURNAL_ENV_VAR = "RESEMBLE_JOURNAL_PATH"
+JOURNAL_VERSION = 2
+
+_STOP = object()
+_local = threading.local()
+
+
+class JournalWriter:
+    """Background thread that appends queued entries to a JSONL file."""
+
+    def __init__(self, path, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        # Open here so a bad path fails at startup instead of in the thread.
+        try:
+            self._file = open(path, "a", encoding="utf-8")
+        except OSError as e:
+            raise ValueError(f"Cannot open request journal {path!r}: {e}") from e
+        self.failed = False
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="request-journal", daemon=True)
+        self._thread.start()
+
+    def write(self, entry):
+        if not self.failed:
+            self._queue.put(entry)
+
+    def close(self, timeout=5.0):
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            self._drain(self._file)
+        except OSError as e:
+            # Stop accepting entries so nothing piles up in the queue.
+            self.failed = True
+            _detach(self)
+            print(f"Request journal disabled after write error: {e}")
+        finally:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+
+    def _drain(self, f):
+        while True:
+            try:
+                entry = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                f.flush()
+                continue
+            # Drain whatever else is already queued before flushing once.
+            while True:
+                if entry is _STOP:
+                    f.flush()
+                    return
+                try:
+                    line = json.dumps(entry, separators=(",", ":"), default=str)
+                except (TypeError, ValueError) as e:
+                    print(f"Skipping request journal entry that can't be serialized: {e}")
+                else:
+                    f.write(line + "\n")
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            f.flush()
+
+
+_writer: JournalWriter | None = None
+
+
+def enable(path):
+    """Start journaling to path. Returns the writer; raises ValueError if path can't be opened."""
+    global _writer
+    disable()
+    _writer = JournalWriter(path)
+    print(f"Request journal enabled: {path}")
+    return _writer
+
+
+def _detach(writer):
+    """Forget writer if it is the active one, without waiting on its thread."""
+    global _writer
+    if _writer is writer:
+        _writer = None
+
+
+def disable():
+    """Stop journaling and flush pending entries."""
+    global _writer
+    if _writer is not None:
+        _writer.close()
+        _writer = None
+
+
+def is_enabled():
+    return _writer is not None
+
+
+def record(entry):
+    """Queue an entry for the writer. No-op when the journal is disabled."""
+    # Read once: the writer thread or atexit may reset _writer concurrently.
+    writer = _writer
+    if writer is not None:
+        writer.write(entry)
+
+
+def begin_call():
+    """Start tracking upstream I/O and the first response byte for a call on this thread."""
+    _local.call = {"upstream": False, "payload_bytes": None, "first_byte": None}
+
+
+def end_call():
+    """
+    Stop tracking and return the call state: whether it went upstream, the
+    payload size it reported (or None) and the perf_counter time of the first byte.
+    """
+    call = getattr(_local, "call", None)
+    _local.call = None
+    return call or {"upstream": False, "payload_bytes": None, "first_byte": None}
+
+
+def mark_upstream(payload_bytes=None):
+    """
+    Note that the call in progress on this thread is about to contact the API.
+
+    payload_bytes overrides the size taken from the decorated argument, for
+    calls that send something other than their input (e.g. trimmed audio).
+    """
+    call = getattr(_local, "call", None)
+    if call is not None:
+        call["upstream"] = True
+        if payload_bytes is not None:
+            call["payload_bytes"] = payload_bytes
+
+
+def mark_first_byte():
+    """Note when the first response byte arrived for the call in progress on this thread."""
+    call = getattr(_local, "call", None)
+    if call is not None and call["first_byte"] is None:
+        call["first_byte"] = time.perf_counter()
+
+
+def _payload_size(value, is_file):
+    if not value:
+        return 0
+    if is_file:
+        try:
+            return os.path.getsize(value)
+        except OSError:
+            return 0
+    return len(str(value).encode("utf-8"))
+
+
+def _succeeded(result):
+    # Generators return (output, status); cloning returns a status message.
+    if isinstance(result, tuple):
+        return result[0] is not None
+    if isinstance(result, str):
+        return not result.startswith(("Error", "Missing"))
+    return result is not None
+
+
+def _status_message(result):
+    if isinstance(result, tuple) and len(result) > 1:
+        return str(result[1])
+    return str(result)
+
+
+def journaled(mode, payload, payload_is_file=False):
+    """
+    Decorator that records one journal entry per call of an API function.
+
+    mode is the request type ("tts", "stream", ...), payload the name of the
+    argument holding the text or audio file path sent upstream.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _writer is None:
+                return func(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = bound.arguments
+            started_at = time.time()
+            start = time.perf_counter()
+            begin_call()
+            result = None
+            error = "interrupted"
+            try:
+                result = func(*args, **kwargs)
+                error = None
+            except Exception as e:
+                error = repr(e)
+                raise
+            finally:
+                end = time.perf_counter()
+                call = end_call()
+                # A journal problem must never replace the call's result or exception.
+                try:
+                    ok = error is None and _succeeded(result)
+                    payload_bytes = call["payload_bytes"]
+                    if payload_bytes is None:
+                        payload_bytes = _payload_size(params.get(payload), payload_is_file)
+                    first_byte = call["first_byte"]
+                    entry = {
+                        "v": JOURNAL_VERSION,
+                        "ts": round(started_at, 6),
+                        "mode": mode,
+                        "upstream": call["upstream"],
+                        "payload_bytes": payload_bytes,
+                        "voice_uuid": params.get("voice_uuid"),
+                        "project_uuid": params.get("project_uuid"),
+                        "language_code": params.get("language_code"),
+                        "total_ms": round((end - start) * 1000, 2),
+                        "first_byte_ms": round((first_byte - start) * 1000, 2) if first_byte else None,
+                        "status": "ok" if ok else "error",
+                    }
+                    if not ok:
+                        entry["error"] = error or _status_message(result)[:200]
+                    record(entry)
+                except Exception as e:
+                    print(f"Request journal error: {e}")
+            return result
+
+        return wrapper
+    return decorator
+
+
+def load(path):
+    """Read a journal file and return its entries sorted by start time."""
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                print(f"Skipping malformed journal line {line_no}")
+    entries.sort(key=lambda e: e.get("ts", 0))
+    return entries
+
+
+def enable_from_env():
+    """Enable the journal if RESEMBLE_JOURNAL_PATH is set."""
+    path = os.getenv(JOURNAL_ENV_VAR)
+    if path and _writer is None:
+        enable(path)
+
+
+atexit.register(disable)
@@ -0,0 +1,329 @@
+"""
+Replay a request journal (see journal.py) as a load test.
+
+Requests are re-issued with the same mode, voice and payload size at their
+original spacing, optionally sped up or slowed down, either against the real
+Resemble API (through the functions in app.py) or against a local stand-in
+server that reproduces the recorded timings. Placeholder text and silent audio
+of the recorded size are sent, since the journal never stores content.
+Calls the app rejected before contacting the API ("upstream": false) are
+never replayed.
+
+Examples:
+    python replay.py requests_journal.jsonl --target local --speed 4 --workers 8
+    python replay.py requests_journal.jsonl --target api --modes tts,stream
+    python replay.py --serve --port 8765
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+import journal
+
+TEXT_MODES = ("tts", "ssml", "stream", "websocket")
+FILE_MODES = ("sts", "enhance")
+# Cloning creates voices on the account, so it is never replayed.
+SKIPPED_MODES = ("clone",)
+
+PLACEHOLDER_WORDS = "the quick brown fox jumps over the lazy dog "
+# generate_sts_batch_clip rejects audio over 2000 base64 chars (1500 raw bytes)
+# without calling the API, so STS placeholders are kept under that.
+STS_MAX_PLACEHOLDER_BYTES = 1500
+
+
+class ClientSideError(Exception):
+    """A replayed request that could not be sent to the target at all."""
+
+# --- Local stand-in ---
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers POST /replay/<mode> after the recorded first-byte and total delays."""
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            entry = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            entry = {}
+        total_s = (entry.get("total_ms") or 0) / 1000
+        first_byte_s = (entry.get("first_byte_ms") or total_s * 1000) / 1000
+        first_byte_s = min(first_byte_s, total_s)
+        time.sleep(first_byte_s)
+        if entry.get("status") == "error":
+            self.send_response(500)
+            self.end_headers()
+            self.wfile.write(b'{"success": false, "message": "replayed error"}')
+            return
+        chunks = 8
+        chunk = b"\0" * 4096
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/wav")
+        self.send_header("Content-Length", str(len(chunk) * chunks))
+        self.end_headers()
+        remaining = max(total_s - first_byte_s, 0)
+        for _ in range(chunks):
+            self.wfile.write(chunk)
+            self.wfile.flush()
+            time.sleep(remaining / chunks)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stand_in(port):
+    server = ThreadingHTTPServer(("127.0.0.1", port), StandInHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="replay-stand-in", daemon=True).start()
+    print(f"Local stand-in listening on http://127.0.0.1:{server.server_address[1]}")
+    return server
+
+
+def send_to_stand_in(base_url, entry):
+    start = time.perf_counter()
+    first_byte = None
+    r = requests.post(f"{base_url}/replay/{entry['mode']}", json=entry, stream=True)
+    for chunk in r.iter_content(chunk_size=4096):
+        if chunk and first_byte is None:
+            first_byte = time.perf_counter()
+    end = time.perf_counter()
+    return r.ok, (end - start) * 1000, (first_byte - start) * 1000 if first_byte else None
+
+# --- Real API ---
+
+
+def placeholder_text(size):
+    repeats = size // len(PLACEHOLDER_WORDS) + 1
+    return (PLACEHOLDER_WORDS * repeats)[:max(size, 1)].strip() or "hello"
+
+
+def placeholder_wav(size, sample_rate=8000):
+    """Write a silent 16-bit mono WAV of roughly size bytes (at least the 44 byte header) and return its path."""
+    frames = max((size - 44) // 2, 1)
+    fd, path = tempfile.mkstemp(suffix=".wav", prefix="replay_")
+    os.close(fd)
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(b"\0\0" * frames)
+    return path
+
+
+def send_to_api(app, entry):
+    mode = entry["mode"]
+    size = entry.get("payload_bytes") or 0
+    voice_uuid = entry.get("voice_uuid")
+    project_uuid = entry.get("project_uuid")
+    language_code = entry.get("language_code") or "en-US"
+    if mode != "enhance" and not (voice_uuid and project_uuid):
+        raise ClientSideError("journal entry has no voice or project UUID")
+    start = time.perf_counter()
+    journal.begin_call()
+    temp_path = None
+    try:
+        if mode == "tts":
+            result = app.generate_tts_clip(placeholder_text(size), voice_uuid, project_uuid, language_code, False)
+        elif mode == "ssml":
+            ssml = f'<speak><lang xml:lang="{language_code}">{placeholder_text(max(size - 50, 1))}</lang></speak>'
+            result = app.generate_ssml_tts_clip(ssml, voice_uuid, project_uuid, language_code)
+        elif mode == "stream":
+            result = app.generate_streaming_tts(placeholder_text(size), voice_uuid, project_uuid, language_code, False)
+        elif mode == "websocket":
+            result = app.generate_streaming_tts_websocket(placeholder_text(size), voice_uuid, project_uuid, language_code, False)
+        elif mode == "sts":
+            temp_path = placeholder_wav(min(size, STS_MAX_PLACEHOLDER_BYTES))
+            result = app.generate_sts_batch_clip(temp_path, voice_uuid, project_uuid, None, language_code)
+        elif mode == "enhance":
+            temp_path = placeholder_wav(size)
+            result = app.enhance_audio(temp_path)
+        else:
+            raise ValueError(f"Unsupported mode: {mode}")
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+        end = time.perf_counter()
+        first_byte = journal.end_call()["first_byte"]
+    return result[0] is not None, (end - start) * 1000, (first_byte - start) * 1000 if first_byte else None
+
+# --- Replay loop ---
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(int(round(pct / 100 * (len(values) - 1))), len(values) - 1)
+    return round(values[index], 2)
+
+
+def replay(entries, send, speed=1.0, workers=4):
+    """
+    Re-issue entries through send(entry) -> (ok, total_ms, first_byte_ms).
+
+    speed scales the original request rate (2.0 = twice as fast); 0 sends
+    everything as fast as the worker pool allows. Returns a list of result dicts.
+    """
+    results = []
+    lock = threading.Lock()
+    in_flight = 0
+    peak_in_flight = 0
+
+    def run(entry, due):
+        nonlocal in_flight, peak_in_flight
+        started = time.perf_counter()
+        with lock:
+            in_flight += 1
+            peak_in_flight = max(peak_in_flight, in_flight)
+        # Exceptions mean the request never got a response from the target.
+        client_side = False
+        try:
+            ok, total_ms, first_byte_ms = send(entry)
+        except Exception as e:
+            print(f"Replay error ({entry['mode']}): {e}")
+            ok, total_ms, first_byte_ms = False, (time.perf_counter() - started) * 1000, None
+            client_side = True
+        with lock:
+            in_flight -= 1
+            results.append({
+                "mode": entry["mode"],
+                "ok": ok,
+                "client_side": client_side,
+                "total_ms": total_ms,
+                "first_byte_ms": first_byte_ms,
+                "queue_wait_ms": max(started - due, 0) * 1000,
+                "recorded_total_ms": entry.get("total_ms"),
+            })
+
+    first_ts = entries[0].get("ts", 0) if entries else 0
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for entry in entries:
+            offset = (entry.get("ts", first_ts) - first_ts) / speed if speed > 0 else 0
+            due = t0 + offset
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(run, entry, due)
+    elapsed = time.perf_counter() - t0
+    print_summary(entries, results, elapsed, peak_in_flight)
+    return results
+
+
+def print_summary(entries, results, elapsed, peak_in_flight):
+    recorded_span = entries[-1].get("ts", 0) - entries[0].get("ts", 0) if entries else 0
+    ok = [r for r in results if r["ok"]]
+    totals = [r["total_ms"] for r in ok]
+    first_bytes = [r["first_byte_ms"] for r in ok if r["first_byte_ms"] is not None]
+    waits = [r["queue_wait_ms"] for r in results]
+    print("\n--- Replay summary ---")
+    client_side = sum(1 for r in results if r["client_side"])
+    print(f"Requests: {len(results)} sent, {len(ok)} ok, {len(results) - len(ok)} failed")
+    if client_side:
+        print(f"  {client_side} of the failures happened client-side and never reached the target")
+    print(f"Wall time: {elapsed:.2f} s (recorded span: {recorded_span:.2f} s)")
+    if elapsed > 0:
+        print(f"Achieved rate: {len(results) / elapsed:.2f} req/s")
+    print(f"Peak in-flight: {peak_in_flight}")
+    print(f"Total ms p50/p90/p99: {percentile(totals, 50)} / {percentile(totals, 90)} / {percentile(totals, 99)}")
+    print(f"First byte ms p50/p90/p99: {percentile(first_bytes, 50)} / {percentile(first_bytes, 90)} / {percentile(first_bytes, 99)}")
+    print(f"Queue wait ms p50/p99: {percentile(waits, 50)} / {percentile(waits, 99)}")
+    by_mode = {}
+    for r in results:
+        by_mode.setdefault(r["mode"], []).append(r)
+    for mode, mode_results in sorted(by_mode.items()):
+        mode_totals = [r["total_ms"] for r in mode_results if r["ok"]]
+        recorded = [r["recorded_total_ms"] for r in mode_results if r["recorded_total_ms"] is not None]
+        print(f"  {mode}: {len(mode_results)} requests, p50 {percentile(mode_totals, 50)} ms (recorded p50 {percentile(recorded, 50)} ms)")
+
+
+def select_entries(entries, modes=None, limit=None, include_errors=True):
+    selected = []
+    for entry in entries:
+        mode = entry.get("mode")
+        if mode in SKIPPED_MODES or mode not in TEXT_MODES + FILE_MODES:
+            continue
+        # Rejected locally by the app, so this load never reached Resemble.
+        if entry.get("upstream") is False:
+            continue
+        if modes and mode not in modes:
+            continue
+        if not include_errors and entry.get("status") != "ok":
+            continue
+        selected.append(entry)
+    return selected[:limit] if limit is not None else selected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a request journal against the Resemble API or a local stand-in.")
+    parser.add_argument("journal", nargs="?", help="Journal file written with RESEMBLE_JOURNAL_PATH set")
+    parser.add_argument("--target", choices=["local", "api"], default="local", help="Where to send requests (default: local)")
+    parser.add_argument("--stand-in-url", help="Use an already running stand-in instead of starting one")
+    parser.add_argument("--port", type=int, default=0, help="Port for the local stand-in (default: any free port)")
+    parser.add_argument("--serve", action="store_true", help="Only run the local stand-in server")
+    parser.add_argument("--speed", type=float, default=1.0, help="Rate multiplier; 0 sends as fast as possible (default: 1.0)")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent requests (default: 4)")
+    parser.add_argument("--modes", help="Comma-separated modes to replay, e.g. tts,stream")
+    parser.add_argument("--limit", type=int, help="Replay at most this many requests")
+    parser.add_argument("--skip-errors", action="store_true", help="Leave out requests that failed when recorded")
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.speed < 0:
+        parser.error("--speed must be 0 or more")
+    if args.limit is not None and args.limit < 1:
+        parser.error("--limit must be at least 1")
+
+    if args.serve:
+        server = start_stand_in(args.port or 8765)
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            server.shutdown()
+        return
+    if not args.journal:
+        parser.error("a journal file is required unless --serve is given")
+
+    modes = set(args.modes.split(",")) if args.modes else None
+    entries = select_entries(journal.load(args.journal), modes, args.limit, not args.skip_errors)
+    if not entries:
+        print("No replayable requests found in the journal.")
+        return
+    print(f"Replaying {len(entries)} requests against {args.target} at {args.speed}x with {args.workers} workers...")
+
+    if args.target == "api":
+        # Don't journal the replay itself into the production journal. An empty
+        # value survives app's load_dotenv() and keeps enable_from_env() off.
+        os.environ[journal.JOURNAL_ENV_VAR] = ""
+        import app
+        journal.disable()
+        # app.py writes every result to fixed file names in the working directory;
+        # keep concurrent replays from overwriting the ones in the repo.
+        work_dir = tempfile.mkdtemp(prefix="replay_")
+        os.chdir(work_dir)
+        print(f"Writing replayed audio to {work_dir}")
+        replay(entries, lambda entry: send_to_api(app, entry), args.speed, args.workers)
+    else:
+        base_url = args.stand_in_url
+        server = None
+        if not base_url:
+            server = start_stand_in(args.port)
+            base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        try:
+            replay(entries, lambda entry: send_to_stand_in(base_url, entry), args.speed, args.workers)
+        finally:
+            if server:
+                server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
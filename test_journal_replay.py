@@ -0,0 +1,186 @@
+"""
+Checks for journal.py and replay.py. Run with: python -m pytest -q test_journal_replay.py
+"""
+import base64
+import json
+import os
+import time
+
+import pytest
+
+import journal
+import replay
+
+
+@journal.journaled("stream", payload="text")
+def fake_stream(text, voice_uuid, project_uuid, language_code="en-US"):
+    if not text:
+        return None, "Missing streaming input"
+    journal.mark_upstream()
+    time.sleep(0.02)
+    journal.mark_first_byte()
+    time.sleep(0.03)
+    if text == "bad":
+        return None, "Streaming error: nope"
+    return "out.wav", "ok"
+
+
+@journal.journaled("sts", payload="source_audio_path", payload_is_file=True)
+def fake_sts(source_audio_path, voice_uuid, project_uuid, sent_bytes=None):
+    journal.mark_upstream(sent_bytes)
+    if sent_bytes is None:
+        raise RuntimeError("boom")
+    return "out.wav", "ok"
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    journal.enable(str(path))
+    yield path
+    journal.disable()
+
+
+def test_journaled_records_timings_status_and_size(journal_path):
+    fake_stream("héllo", "v1", "p1")
+    fake_stream("bad", "v1", "p1", language_code="mr-IN")
+    journal.disable()
+
+    ok, failed = journal.load(str(journal_path))
+    assert ok["mode"] == "stream"
+    assert ok["payload_bytes"] == len("héllo".encode("utf-8"))
+    assert ok["voice_uuid"] == "v1" and ok["project_uuid"] == "p1"
+    assert ok["status"] == "ok" and "error" not in ok
+    assert ok["upstream"] is True
+    assert 15 <= ok["first_byte_ms"] < ok["total_ms"]
+    assert failed["status"] == "error"
+    assert failed["error"] == "Streaming error: nope"
+    assert failed["language_code"] == "mr-IN"
+
+
+def test_journaled_records_exceptions_and_file_size(journal_path, tmp_path):
+    audio = tmp_path / "in.wav"
+    audio.write_bytes(b"\0" * 123)
+    with pytest.raises(RuntimeError):
+        fake_sts(str(audio), "v1", "p1")
+    journal.disable()
+
+    (entry,) = journal.load(str(journal_path))
+    assert entry["payload_bytes"] == 123
+    assert entry["status"] == "error"
+    assert "boom" in entry["error"]
+    assert entry["first_byte_ms"] is None
+
+
+def test_disabled_journal_writes_nothing():
+    journal.disable()
+    assert fake_stream("hello", "v1", "p1") == ("out.wav", "ok")
+    assert not journal.is_enabled()
+
+
+def test_enable_fails_fast_on_bad_path(tmp_path):
+    with pytest.raises(ValueError, match="Cannot open request journal"):
+        journal.enable(str(tmp_path / "missing" / "journal.jsonl"))
+    assert not journal.is_enabled()
+
+
+def test_local_rejections_are_marked_and_not_replayed(journal_path):
+    fake_stream("", "v1", "p1")
+    fake_stream("hello", "v1", "p1")
+    journal.disable()
+
+    rejected, sent = journal.load(str(journal_path))
+    assert rejected["upstream"] is False and rejected["status"] == "error"
+    assert sent["upstream"] is True
+    assert replay.select_entries([rejected, sent]) == [sent]
+
+
+def test_reported_payload_size_overrides_argument(journal_path, tmp_path):
+    audio = tmp_path / "in.wav"
+    audio.write_bytes(b"\0" * 5000)
+    fake_sts(str(audio), "v1", "p1", sent_bytes=1400)
+    journal.disable()
+
+    (entry,) = journal.load(str(journal_path))
+    assert entry["payload_bytes"] == 1400
+
+
+def test_journal_errors_do_not_reach_the_caller(journal_path, monkeypatch):
+    def broken_record(entry):
+        raise AttributeError("writer went away")
+
+    monkeypatch.setattr(journal, "record", broken_record)
+    assert fake_stream("hello", "v1", "p1") == ("out.wav", "ok")
+
+
+def test_unserializable_entry_keeps_journal_enabled(journal_path):
+    journal.record({"value": object()})
+    fake_stream("hello", "v1", "p1")
+    journal.disable()
+
+    first, second = journal.load(str(journal_path))
+    assert first["value"].startswith("<object object")
+    assert second["mode"] == "stream"
+
+
+@pytest.mark.skipif(not os.path.exists("/dev/full"), reason="needs /dev/full")
+def test_io_error_disables_journal():
+    journal.enable("/dev/full")
+    journal.record({"mode": "tts"})
+    for _ in range(50):
+        if not journal.is_enabled():
+            break
+        time.sleep(0.05)
+    assert not journal.is_enabled()
+
+
+@pytest.mark.parametrize("size", [0, 800, 1500, 50000])
+def test_sts_placeholder_fits_app_limit(size):
+    path = replay.placeholder_wav(min(size, replay.STS_MAX_PLACEHOLDER_BYTES))
+    try:
+        with open(path, "rb") as f:
+            encoded = base64.b64encode(f.read())
+    finally:
+        os.remove(path)
+    assert len(encoded) <= 2000
+
+
+def test_replay_through_local_stand_in(journal_path, capsys):
+    fake_stream("hello", "v1", "p1")
+    fake_stream("bad", "v1", "p1")
+    journal.disable()
+    entries = replay.select_entries(journal.load(str(journal_path)))
+
+    server = replay.start_stand_in(0)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        results = replay.replay(entries, lambda e: replay.send_to_stand_in(base_url, e), speed=0, workers=2)
+        unreachable = replay.replay(entries[:1], lambda e: replay.send_to_stand_in("http://127.0.0.1:9", e), speed=0)
+    finally:
+        server.shutdown()
+
+    assert sorted(r["ok"] for r in results) == [False, True]
+    assert not any(r["client_side"] for r in results)
+    ok = next(r for r in results if r["ok"])
+    assert ok["first_byte_ms"] is not None and ok["first_byte_ms"] <= ok["total_ms"]
+    assert unreachable[0]["client_side"]
+    assert "never reached the target" in capsys.readouterr().out
+
+
+def test_select_entries_skips_clone_and_filters():
+    entries = [
+        {"mode": "clone", "status": "ok"},
+        {"mode": "tts", "status": "ok"},
+        {"mode": "stream", "status": "error"},
+    ]
+    assert [e["mode"] for e in replay.select_entries(entries)] == ["tts", "stream"]
+    assert [e["mode"] for e in replay.select_entries(entries, include_errors=False)] == ["tts"]
+    assert [e["mode"] for e in replay.select_entries(entries, modes={"stream"})] == ["stream"]
+    assert replay.select_entries(entries, limit=0) == []
+
+
+def test_journal_lines_are_compact_json(journal_path):
+    fake_stream("hello", "v1", "p1")
+    journal.disable()
+    line = journal_path.read_text().strip()
+    assert json.loads(line)["v"] == journal.JOURNAL_VERSION